@@ -14,11 +14,12 @@
 # limitations under the License.
 #
 import logging
+import math
 import traceback
 from datetime import datetime
 from json import JSONEncoder
 from logging import Handler, LogRecord
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 from glogger.messages_buffer import MessagesBuffer
 from glogger.sender import Sender
@@ -68,6 +69,8 @@ class BatchRequestsHandler(Handler):
         self.jsonify = JSONEncoder(separators=(",", ":"), default=repr).encode  # compact, no whitespace
         self.messages_buffer = MessagesBuffer(max_total_length, overflow_drop_factor)
         self.messages_buffer.head_serial_no = continue_from
+        # (whole seconds, their isoformat) of the last formatted timestamp
+        self._timestamp_cache: Tuple[float, str] = (math.nan, "")
 
         self.sender: Optional[Sender] = None
         if sender is not None:
@@ -109,7 +112,7 @@ class BatchRequestsHandler(Handler):
                 "pathname": record.pathname,
                 "funcname": record.funcName,
                 "thread": record.thread,
-                "timestamp": datetime.utcfromtimestamp(record.created).isoformat(),
+                "timestamp": self._format_timestamp(record.created),
                 self.EXCEPTION_KEY: self._get_exception_traceback(record),
                 self.EXTRA_KEY: extra,
             },
@@ -127,6 +130,24 @@ class BatchRequestsHandler(Handler):
 
         return self._truncate_dict(dict, result)
 
+    def _format_timestamp(self, created: float) -> str:
+        """
+        Same as datetime.utcfromtimestamp(created).isoformat(), but formats the date and time only once per second,
+        since consecutive records mostly share it.
+        """
+        fraction, seconds = math.modf(created)
+        # utcfromtimestamp() rounds half-even to microseconds, which may carry into the next second
+        microseconds = round(fraction * 1_000_000)
+        if not 0 <= microseconds < 1_000_000:
+            return datetime.utcfromtimestamp(created).isoformat()
+
+        cached_seconds, prefix = self._timestamp_cache
+        if seconds != cached_seconds:
+            prefix = datetime.utcfromtimestamp(seconds).isoformat()
+            self._timestamp_cache = (seconds, prefix)
+        # isoformat() omits the fraction altogether when it's zero
+        return f"{prefix}.{microseconds:06d}" if microseconds else prefix
+
     def _get_exception_traceback(self, record: LogRecord) -> str:
         if record.exc_text:
             # Use cached exc_text if available.
@@ -16,8 +16,10 @@
 
 from __future__ import annotations
 
-from concurrent.futures import Future, ThreadPoolExecutor, _base, as_completed
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, _base
 from contextlib import contextmanager
+from queue import Empty, SimpleQueue
 from typing import Any, Callable, Collection, Generator
 
 
@@ -49,6 +51,15 @@ def call_in_parallel(
     from the call to call_in_parallel()
     """
     with wrap_thread_pool(ThreadPoolExecutor(max_workers=min(len(callables), max_threads))) as pool:
-        futures = {pool.submit(callable) for callable in callables}
-        for completed in as_completed(futures, timeout):
-            yield completed
+        # Futures are queued by their done-callbacks as they finish, so each __next__() is a single blocking get().
+        completed: SimpleQueue[Future] = SimpleQueue()
+        futures = [pool.submit(callable) for callable in callables]
+        for future in futures:
+            future.add_done_callback(completed.put)
+
+        deadline = time.monotonic() + timeout
+        for yielded in range(len(futures)):
+            try:
+                yield completed.get(timeout=max(0.0, deadline - time.monotonic()))
+            except Empty:
+                raise TimeoutError(f"{len(futures) - yielded} (of {len(futures)}) futures unfinished") from None
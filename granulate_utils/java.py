@@ -20,8 +20,9 @@ import dataclasses
 import os
 import re
 import signal
+import sys
 from itertools import dropwhile
-from typing import Any, Dict, Iterable, List, Literal, Optional, Union
+from typing import Any, Dict, Iterable, List, Literal, Optional, Tuple, Union
 
 from packaging.version import Version
 
@@ -139,6 +140,16 @@ class JvmVersion:
     zing_version: Optional[Version] = None  # major.minor.patch version, non-None if Zing
 
 
+# matches the build string from e.g (build 25.212-b04, mixed mode) -> "25.212-b04"
+_JVM_BUILD_REGEX = re.compile(r"\((?:product )?build ([^,)]+?)(?:,|\))")
+# suffixes of the quoted version which are stripped before parsing, e.g "11.0.2-ea" or "1.8.0-zing_19.12.103.0"
+_VERSION_SUFFIX_REGEX = re.compile(r"-(?:internal|ea|ojdkbuild|zing_[\d\.]+)$")
+_BUILD_NUMBER_REGEX = re.compile(r"\d+")
+_VM_NAME_REGEX = re.compile(r"(.*?) (?:\(.*\))?\((?:product )?build")
+_ZING_VERSION_REGEX = re.compile(r"Zing ?(\d+\.\d+\.\d+)\.")
+_OLD_ZING_VERSION_REGEX = re.compile(r"\((?:product )?build[^\)]+zing_(\d+\.\d+\.\d+)\.[^\(]+\)")
+
+
 # Parse java version information from "java -version" output
 def parse_jvm_version(version_string: str) -> JvmVersion:
     # Example java -version output:
@@ -155,15 +166,11 @@ def parse_jvm_version(version_string: str) -> JvmVersion:
 
     # version is always in quotes
     _, version_str, _ = lines[0].split('"')
-    # matches the build string from e.g (build 25.212-b04, mixed mode) -> "25.212-b04"
-    m = re.search(r"\((?:product )?build ([^,)]+?)(?:,|\))", version_string)
+    m = _JVM_BUILD_REGEX.search(version_string)
     assert m is not None, f"did not find build_str in {version_string!r}"
     build_str = m.group(1)
 
-    if (
-        any(version_str.endswith(suffix) for suffix in ("-internal", "-ea", "-ojdkbuild"))
-        or re.search(r"-zing_[\d\.]+$", version_str) is not None
-    ):
+    if _VERSION_SUFFIX_REGEX.search(version_str) is not None:
         # strip those suffixes to keep the rest of the parsing logic clean
         version_str = version_str.rsplit("-")[0]
 
@@ -197,12 +204,12 @@ def parse_jvm_version(version_string: str) -> JvmVersion:
         assert "+" in build_str, f"Did not find expected build number prefix in new-style java version: {build_str!r}"
         # The goal of the regex here is to read the build number until a non-digit character is encountered,
         # since additional information can be appended after it, such as the platform name
-        matched = re.match(r"\d+", build_str[build_str.find("+") + 1 :])
+        matched = _BUILD_NUMBER_REGEX.match(build_str[build_str.find("+") + 1 :])
         assert matched, f"Unexpected build number format in new-style java version: {build_str!r}"
         build = int(matched[0])
 
     # There is no real format here, just use the entire description string until the part which describes the build.
-    m = re.match(r"(.*?) (?:\(.*\))?\((?:product )?build", lines[2])
+    m = _VM_NAME_REGEX.match(lines[2])
     assert m is not None, f"Missing build description? {lines[2]}"
     vm_name = m.group(1)
 
@@ -219,11 +226,11 @@ def parse_jvm_version(version_string: str) -> JvmVersion:
     if vm_type == "Zing":
         # name is e.g Zing 64-Bit Tiered VM Zing22.04.1.0+1
         # or (Zing 21.12.0.0-b2-linux64) from the azul/prime:1.8.0-312-2-21.12.0.0 image.
-        m = re.search(r"Zing ?(\d+\.\d+\.\d+)\.", vm_name)
+        m = _ZING_VERSION_REGEX.search(vm_name)
         if m is None:
             # Zing <= 20 versions have a different format
             # this matches the "20" out of (build 1.8.0-zing_20.03.0.0-b1).
-            m = re.search(r"\((?:product )?build[^\)]+zing_(\d+\.\d+\.\d+)\.[^\(]+\)", version_string)
+            m = _OLD_ZING_VERSION_REGEX.search(version_string)
             assert m is not None, f"Missing old format of Zing version? {version_string!r}"
         zing_version: Optional[Version] = Version(m.group(1))
     else:
@@ -240,13 +247,17 @@ class JvmFlag:
     origin: str
     kind: List[str]
 
+    # Whitespace is matched with [^\S\n] (i.e. whitespace except newlines) so a match never spans lines,
+    # which lets parse_jvm_flags() scan the entire VM.flags output in one pass.
+    # To keep backtracking low (the stdlib re has no possessive quantifiers before 3.11), matches may only
+    # start at the beginning of a word and the braces' contents are matched by classes that stop at "}".
     vm_flags_pattern = re.compile(
-        r"(?P<flag_type>\S+)\s+"
-        r"(?P<flag_name>\S+)\s+"
+        r"(?<!\S)(?P<flag_type>\S+)[^\S\n]+"
+        r"(?P<flag_name>\S+)[^\S\n]+"
         r"(?P<flag_equal_sign_prefix>:)?= "
-        r"(?P<flag_value>\S+)\s+"  # noqa: E501 # We don't support empty string nor spaces in flag values, although both are legal values
-        r"{(?P<flag_kind>.+?)}"
-        r"(?:\s*{(?P<flag_origin_jdk_9>.*)})?"
+        r"(?P<flag_value>\S+)[^\S\n]+"  # noqa: E501 # We don't support empty string nor spaces in flag values, although both are legal values
+        r"{(?P<flag_kind>[^}\n]+)}"
+        r"(?:[^\S\n]*{(?P<flag_origin_jdk_9>[^}\n]*)})?"
     )
 
     def to_dict(self) -> Dict[str, Union[str, List[str]]]:
@@ -287,10 +298,32 @@ class JvmFlag:
         - We don't support empty string nor spaces in flag values, although its legal values
         """
 
+        if "=" not in line:
+            # cheap reject for lines that can't be flags (e.g empty lines) before running the regex
+            return None
+
         match = cls.vm_flags_pattern.search(line)
         if match is None:
             return None
 
+        return cls.from_match(match)
+
+    @classmethod
+    def from_match(cls, match: re.Match) -> JvmFlag:
+        """
+        Build a JvmFlag from a match of `vm_flags_pattern`. See `from_str` for the format.
+        """
+        origin, kind = cls._get_origin_and_kind(match)
+        return cls(
+            name=match.group("flag_name"),
+            type=sys.intern(match.group("flag_type")),
+            value=match.group("flag_value"),
+            origin=origin,
+            kind=kind,
+        )
+
+    @staticmethod
+    def _get_origin_and_kind(match: re.Match) -> Tuple[str, List[str]]:
         # get the flag origin if jvm 9+, otherwise get is the flag from non default origin as described above
         flag_origin_jdk_9 = match.group("flag_origin_jdk_9")
 
@@ -305,19 +338,54 @@ class JvmFlag:
             else:
                 flag_origin = "default"
         else:
-            flag_origin = flag_origin_jdk_9
+            flag_origin = sys.intern(flag_origin_jdk_9)
 
-        # split the list of space separated flag_kinds as described above
-        flag_kind = match.group("flag_kind").split()
+        # split the list of space separated flag_kinds as described above.
+        # (flag types, origins and kinds come from small vocabularies, so they are interned and shared between flags)
+        flag_kind = [sys.intern(kind) for kind in match.group("flag_kind").split()]
 
-        return cls(
-            name=match.group("flag_name"),
-            type=match.group("flag_type"),
-            value=match.group("flag_value"),
-            origin=flag_origin,
-            kind=sorted(flag_kind),
-        )
+        return flag_origin, sorted(flag_kind)
+
+
+@dataclasses.dataclass
+class JvmFlagTable:
+    """
+    JVM flags stored column-wise: the i-th flag is (names[i], types[i], values[i], origins[i], kinds[i]).
+    Avoids an object per flag when scanning many flags by a few fields.
+    """
+
+    names: List[str] = dataclasses.field(default_factory=list)
+    types: List[str] = dataclasses.field(default_factory=list)
+    values: List[str] = dataclasses.field(default_factory=list)
+    origins: List[str] = dataclasses.field(default_factory=list)
+    kinds: List[List[str]] = dataclasses.field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def to_list_of_flag(self) -> List[JvmFlag]:
+        return [
+            JvmFlag(name=name, type=flag_type, value=value, origin=origin, kind=kind)
+            for name, flag_type, value, origin, kind in zip(
+                self.names, self.types, self.values, self.origins, self.kinds
+            )
+        ]
 
 
 def parse_jvm_flags(jvm_flags_string: str) -> List[JvmFlag]:
-    return [flag for line in jvm_flags_string.splitlines() if (flag := JvmFlag.from_str(line)) is not None]
+    return [JvmFlag.from_match(match) for match in JvmFlag.vm_flags_pattern.finditer(jvm_flags_string)]
+
+
+def parse_jvm_flags_columnar(jvm_flags_string: str) -> JvmFlagTable:
+    """
+    Like parse_jvm_flags, but returns the flags as a JvmFlagTable.
+    """
+    table = JvmFlagTable()
+    for match in JvmFlag.vm_flags_pattern.finditer(jvm_flags_string):
+        origin, kind = JvmFlag._get_origin_and_kind(match)
+        table.names.append(match.group("flag_name"))
+        table.types.append(sys.intern(match.group("flag_type")))
+        table.values.append(match.group("flag_value"))
+        table.origins.append(origin)
+        table.kinds.append(kind)
+    return table
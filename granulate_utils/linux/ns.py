@@ -87,9 +87,14 @@ def resolve_proc_root_links(proc_root: str, ns_path: str) -> str:
 
     while parts:
         part = parts.popleft()
-        path = os.path.join(path, part)
+        # parts are single relative components, so plain concatenation is equivalent to os.path.join() here
+        path = path + part if path.endswith("/") else f"{path}/{part}"
 
-        if not os.path.islink(path):
+        # resolve the part. a single readlink() is cheaper than lstat() followed by readlink(); it fails
+        # (EINVAL, ENOENT, ...) exactly where os.path.islink() would return False.
+        try:
+            ns_link = os.readlink(path)
+        except OSError:
             continue
 
         # detect symlink loops
@@ -97,8 +102,6 @@ def resolve_proc_root_links(proc_root: str, ns_path: str) -> str:
             raise RuntimeError("Symlink loop from %r" % os.path.join(path, part))
         seen.add(path)
 
-        # resolve the part
-        ns_link = os.readlink(path)
         if os.path.isabs(ns_link):
             # absolute - reset to root and encode the resolved absolute link in parts
             path = proc_root
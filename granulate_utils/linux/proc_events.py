@@ -25,8 +25,8 @@ https://nick-black.com/dankwiki/index.php/The_Proc_Connector_and_Socket_Filters
 
 
 TODO: Add more callbacks.
-TODO: Use socket filter to avoid waking up for irrelevant events.
 """
+import ctypes
 import os
 import selectors
 import socket
@@ -100,6 +100,11 @@ class _ProcEventsListener(threading.Thread):
 
     # From enum proc_cn_mcast_op
     _PROC_CN_MCAST_LISTEN = 1
+    _cn_proc_op = struct.Struct("=I")
+
+    # The cn_msg subscribing to process events never changes, only its netlink header carries our pid
+    _MCAST_LISTEN_CN_MSG = _cn_msg.pack(_CN_IDX_PROC, _CN_VAL_PROC, 0, 0, _cn_proc_op.size, 0)
+    _MCAST_LISTEN_CN_MSG += _cn_proc_op.pack(_PROC_CN_MCAST_LISTEN)
 
     # struct exit_proc_event {
     #         __kernel_pid_t process_pid;
@@ -114,27 +119,137 @@ class _ProcEventsListener(threading.Thread):
     # } exec;
     _exec_proc_event = struct.Struct("=2I")
 
+    # A proc_event header followed by an exit_proc_event, decoded in a single call. The union is sized by its
+    # largest member, so this is safe for every event, and exec's pid & tgid overlap exit's.
+    _proc_event_with_exit = struct.Struct(_base_proc_event.format + _exit_proc_event.format[1:])
+
+    # asm-generic/socket.h:
+    _SO_ATTACH_FILTER = 26
+
+    # linux/filter.h (classic BPF):
+    # struct sock_filter {
+    #         __u16   code;
+    #         __u8    jt;
+    #         __u8    jf;
+    #         __u32   k;
+    # };
+    # struct sock_fprog {
+    #         unsigned short          len;
+    #         struct sock_filter      *filter;
+    # };
+    _sock_filter = struct.Struct("HBBI")
+    _sock_fprog = struct.Struct("HP")
+    _BPF_LD_W_ABS = 0x20
+    _BPF_JMP_JEQ_K = 0x15
+    _BPF_RET_K = 0x06
+
+    _SELECT_BREAKER_WAKEUP = struct.pack("=Q", 1)
+
+    # Every message we care about fits well within this
+    _RECV_BUFFER_SIZE = 256
+
     def __init__(self) -> None:
         self._socket = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, self._NETLINK_CONNECTOR)
         self._exit_callbacks: List[Callable] = []
         self._exec_callbacks: List[Callable] = []
+        # Guards the callback lists, the listener thread only iterates snapshots of them
+        self._callbacks_lock = threading.Lock()
         self._should_stop = False
+        # Reused for every recv_into() so a busy event stream doesn't allocate per message
+        self._recv_buffer = bytearray(self._RECV_BUFFER_SIZE)
+        self._recv_view = memoryview(self._recv_buffer)
 
         self._selector = selectors.DefaultSelector()
-        # Create a pipe so we can make select() return
-        self._select_breaker_reader, self._select_breaker = os.pipe()
+        # Create an eventfd (or a pipe before Python 3.10) so we can make select() return
+        if hasattr(os, "eventfd"):
+            self._select_breaker_reader = self._select_breaker = os.eventfd(0)
+        else:
+            self._select_breaker_reader, self._select_breaker = os.pipe()
         self._selector.register(self._select_breaker_reader, selectors.EVENT_READ)
 
         super().__init__(target=self._proc_events_listener, name="Process Events Listener", daemon=True)
 
+    @classmethod
+    def _build_socket_filter(cls) -> bytes:
+        """Classic BPF program accepting only the proc_event.what values we have callbacks for"""
+        what_offset = cls._nlmsghdr.size + cls._cn_msg.size
+
+        # BPF loads words in network byte order, so compare against the big-endian view of the native values
+        def as_loaded(value: int) -> int:
+            return int.from_bytes(struct.pack("=I", value), "big")
+
+        return b"".join(
+            cls._sock_filter.pack(*insn)
+            for insn in (
+                (cls._BPF_LD_W_ABS, 0, 0, what_offset),
+                (cls._BPF_JMP_JEQ_K, 1, 0, as_loaded(cls._PROC_EVENT_EXIT)),
+                (cls._BPF_JMP_JEQ_K, 0, 1, as_loaded(cls._PROC_EVENT_EXEC)),
+                (cls._BPF_RET_K, 0, 0, 0xFFFFFFFF),
+                (cls._BPF_RET_K, 0, 0, 0),
+            )
+        )
+
+    def _attach_socket_filter(self, sock: socket.socket) -> None:
+        """Drop irrelevant events in the kernel so they never wake up the listener thread"""
+        program = self._build_socket_filter()
+        program_buffer = ctypes.create_string_buffer(program, len(program))
+        fprog = self._sock_fprog.pack(len(program) // self._sock_filter.size, ctypes.addressof(program_buffer))
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, self._SO_ATTACH_FILTER, fprog)
+        except OSError:
+            # The filter is only an optimization, the listener loop checks the event type anyway
+            pass
+
     def _register_for_connector_events(self, socket: socket.socket) -> None:
         """Notify the kernel that we're listening for events on the connector"""
-        cn_proc_op = struct.Struct("=I").pack(self._PROC_CN_MCAST_LISTEN)
-        cn_msg = self._cn_msg.pack(self._CN_IDX_PROC, self._CN_VAL_PROC, 0, 0, len(cn_proc_op), 0) + cn_proc_op
+        cn_msg = self._MCAST_LISTEN_CN_MSG
         nl_msg = self._nlmsghdr.pack(self._nlmsghdr.size + len(cn_msg), self._NLMSG_DONE, 0, 0, os.getpid()) + cn_msg
 
         socket.send(nl_msg)
 
+    def _handle_message(self, data: memoryview) -> None:
+        _, nl_type, _, _, _ = self._nlmsghdr.unpack_from(data)
+        if nl_type != self._NLMSG_DONE:
+            # Handle only netlink messages
+            return
+
+        # Skip the headers
+        # (Notice that exit_signal is the signal that the parent process received on exit, and not the
+        # signal that caused it)
+        what, _, _, pid, tgid, exit_code, _ = self._proc_event_with_exit.unpack_from(
+            data, self._nlmsghdr.size + self._cn_msg.size
+        )
+
+        if what == self._PROC_EVENT_EXIT:
+            with self._callbacks_lock:
+                exit_callbacks = tuple(self._exit_callbacks)
+
+            for callback in exit_callbacks:
+                callback(pid, tgid, exit_code)
+        elif what == self._PROC_EVENT_EXEC:
+            with self._callbacks_lock:
+                exec_callbacks = tuple(self._exec_callbacks)
+
+            for callback in exec_callbacks:
+                callback(pid, tgid)
+
+    def _drain_socket(self) -> None:
+        """Handle every message queued on the (nonblocking) socket, so a burst costs a single select()"""
+        while not self._should_stop:
+            try:
+                nbytes = self._socket.recv_into(self._recv_buffer)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                # When stressed, reading from the socket can raise
+                #   OSError: [Errno 105] No buffer space available
+                # This seems to be safe to ignore, empirically no events were missed
+                if e.errno == 105:
+                    continue
+                raise
+
+            self._handle_message(self._recv_view[:nbytes])
+
     def _listener_loop(self) -> None:
         while not self._should_stop:
             events = self._selector.select()
@@ -142,64 +257,9 @@ class _ProcEventsListener(threading.Thread):
                 break
 
             for key, _ in events:
-                try:
-                    # When stressed, reading from the socket can raise
-                    #   OSError: [Errno 105] No buffer space available
-                    # This seems to be safe to ignore, empirically no events were missed
-                    data = key.fileobj.recv(256)  # type: ignore # it's a pipe
-                except OSError as e:
-                    if e.errno == 105:
-                        continue
-                    raise
-
-                nl_hdr = dict(
-                    zip(("len", "type", "flags", "seq", "pid"), self._nlmsghdr.unpack(data[: self._nlmsghdr.size]))
-                )
-                if nl_hdr["type"] != self._NLMSG_DONE:
-                    # Handle only netlink messages
-                    continue
-
-                # Strip off headers
-                data = data[self._nlmsghdr.size : nl_hdr["len"]]
-                data = data[self._cn_msg.size :]
-
-                event = dict(
-                    zip(
-                        ("what", "cpu", "timestamp_ns"),
-                        self._base_proc_event.unpack(data[: self._base_proc_event.size]),
-                    )
-                )
-
-                if event["what"] == self._PROC_EVENT_EXIT:
-                    # (Notice that exit_signal is the signal that the parent process received on exit, and not the
-                    # signal that caused it)
-                    event_data = dict(
-                        zip(
-                            ("pid", "tgid", "exit_code", "exit_signal"),
-                            self._exit_proc_event.unpack(
-                                data[
-                                    self._base_proc_event.size : self._base_proc_event.size + self._exit_proc_event.size
-                                ]
-                            ),
-                        )
-                    )
-
-                    for callback in self._exit_callbacks:
-                        callback(event_data["pid"], event_data["tgid"], event_data["exit_code"])
-                elif event["what"] == self._PROC_EVENT_EXEC:
-                    event_data = dict(
-                        zip(
-                            ("pid", "tgid"),
-                            self._exec_proc_event.unpack(
-                                data[
-                                    self._base_proc_event.size : self._base_proc_event.size + self._exec_proc_event.size
-                                ]
-                            ),
-                        )
-                    )
-
-                    for callback in self._exec_callbacks:
-                        callback(event_data["pid"], event_data["tgid"])
+                # The select breaker is only written to on stop(), which is handled above
+                if key.fileobj is self._socket:
+                    self._drain_socket()
 
     def _proc_events_listener(self):
         """Runs forever and calls registered callbacks on process events"""
@@ -208,47 +268,61 @@ class _ProcEventsListener(threading.Thread):
         try:
             self._listener_loop()
         finally:
-            # Cleanup
-            self._selector.unregister(self._socket)
-            self._selector.unregister(self._select_breaker_reader)
-            self._socket.close()
-            os.close(self._select_breaker)
+            self._close()
+
+    def _close(self) -> None:
+        """Release the selector, the socket and the select-breaker FD(s)"""
+        self._selector.close()
+        self._socket.close()
+        os.close(self._select_breaker)
+        if self._select_breaker_reader != self._select_breaker:
             os.close(self._select_breaker_reader)
 
     def start(self):
         # We make these initializations here (and not in the new thread) so if an exception occurs it'll be
         # visible in the calling thread
         try:
-            self._socket.bind((0, self._CN_IDX_PROC))
-            self._register_for_connector_events(self._socket)
-        except PermissionError as e:
-            raise PermissionError(
-                "This process doesn't have permissions to bind/connect to the process events connector"
-            ) from e
-
-        super().start()
+            try:
+                self._socket.bind((0, self._CN_IDX_PROC))
+                self._attach_socket_filter(self._socket)
+                self._register_for_connector_events(self._socket)
+                self._socket.setblocking(False)
+            except PermissionError as e:
+                raise PermissionError(
+                    "This process doesn't have permissions to bind/connect to the process events connector"
+                ) from e
+
+            super().start()
+        except BaseException:
+            # The listener thread never ran, so it won't clean up after us
+            self._close()
+            raise
 
     @_raise_if_not_running
     def stop(self):
         self._should_stop = True
-        # Write to make select() return
-        os.write(self._select_breaker, b"\0")
+        # Write to make select() return (an eventfd takes a native 8-byte counter increment, a pipe anything)
+        os.write(self._select_breaker, self._SELECT_BREAKER_WAKEUP)
 
     @_raise_if_not_running
     def register_exit_callback(self, callback: Callable):
-        self._exit_callbacks.append(callback)
+        with self._callbacks_lock:
+            self._exit_callbacks.append(callback)
 
     @_raise_if_not_running
     def unregister_exit_callback(self, callback: Callable):
-        self._exit_callbacks.remove(callback)
+        with self._callbacks_lock:
+            self._exit_callbacks.remove(callback)
 
     @_raise_if_not_running
     def register_exec_callback(self, callback: Callable):
-        self._exec_callbacks.append(callback)
+        with self._callbacks_lock:
+            self._exec_callbacks.append(callback)
 
     @_raise_if_not_running
     def unregister_exec_callback(self, callback: Callable):
-        self._exec_callbacks.remove(callback)
+        with self._callbacks_lock:
+            self._exec_callbacks.remove(callback)
 
 
 _proc_events_listener: Optional[_ProcEventsListener] = None
@@ -271,7 +345,6 @@ def _ensure_thread_started(func: Callable):
                     # needs to run in init net NS - see netlink_kernel_create() call on init_net in cn_init().
                     _proc_events_listener = ns.run_in_ns(["net"], _start_listener)
                 except Exception:
-                    # TODO: We leak the pipe FDs here...
                     _proc_events_listener = None
                     raise
 
@@ -15,12 +15,14 @@
 #
 import dataclasses
 import gzip
+import itertools
 import json
 import logging
 import random
 import time
 from contextlib import ExitStack
 from copy import deepcopy
+from datetime import datetime
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from threading import Thread
 
@@ -139,6 +141,9 @@ class MockAdapter(HTTPAdapter):
             return response
 
 
+_logger_ids = itertools.count()
+
+
 def get_logger(handler):
     # use granulate_utils logger as parent so we also capture logs from within in the same handler.
     utils_logger = logging.getLogger("glogger")
@@ -147,7 +152,7 @@ def get_logger(handler):
         h.close()
     utils_logger.addHandler(handler)
     utils_logger.setLevel(10)
-    logger = utils_logger.getChild(random.randbytes(8).hex())
+    logger = utils_logger.getChild(f"test{next(_logger_ids)}")
     return logger
 
 
@@ -410,6 +415,17 @@ def test_truncate_dict_logic():
         assert handler.SERIAL_NO_KEY in result[handler.TEXT_KEY]
 
 
+def test_format_timestamp():
+    with ExitStack() as exit_stack:
+        handler = MockBatchRequestsHandler("localhost:61234")
+        exit_stack.callback(handler.close)
+
+        now = time.time()
+        # include whole seconds and fractions rounding up into the next second
+        for created in [now, now + 0.25, now + 1, 1700000000.0, 1700000000.0000004, 1700000000.9999996, 0.5]:
+            assert handler._format_timestamp(created) == datetime.utcfromtimestamp(created).isoformat()
+
+
 def test_identifiers():
     """Test message serial numbers are always consecutive and do not repeat."""
     with ExitStack() as exit_stack:
@@ -417,12 +433,16 @@ def test_identifiers():
         exit_stack.callback(handler.close)
 
         logger = get_logger(handler)
+        # consecutive batches mostly hold the same logs, so parse each one only once.
+        serial_no_by_log = {}
         for i in range(1000):
             logger.info("A" * random.randint(50, 600))
             if i % 7 == 0:
                 logs = handler.sender._make_batch().logs
-                serial_nos = [json.loads(log)[handler.TEXT_KEY][handler.SERIAL_NO_KEY] for log in logs]
-                assert_serial_nos_ok(serial_nos)
+                for log in logs:
+                    if log not in serial_no_by_log:
+                        serial_no_by_log[log] = json.loads(log)[handler.TEXT_KEY][handler.SERIAL_NO_KEY]
+                assert_serial_nos_ok([serial_no_by_log[log] for log in logs])
 
 
 def test_flush_when_length_threshold_reached():
@@ -2,7 +2,7 @@ from typing import Dict, List, Union
 
 import pytest
 
-from granulate_utils.java import JvmFlag, parse_jvm_flags
+from granulate_utils.java import JvmFlag, parse_jvm_flags, parse_jvm_flags_columnar
 
 
 @pytest.mark.parametrize(
@@ -105,6 +105,33 @@ def test_parse_jvm_flags(jvm_flags_string: str, expected_jvm_flags_list: List[Jv
     assert parse_jvm_flags(jvm_flags_string) == expected_jvm_flags_list
 
 
+def test_parse_jvm_flags_columnar() -> None:
+    jvm_flags_string = """
+    uintx NewSize                                  := 357564416                           {product}
+     intx NumberOfLoopInstrToAlign                 = 4                                      {C2 product} {management}
+ccstrlist OnError                                  = cat hs_err_pid%p.log
+          OnError                                 += ps -ef                                    {product} {command line}
+     bool OptimizeFill                             = true                                   {C2 product} {command line, ergonomic}
+"""  # noqa: E501
+    table = parse_jvm_flags_columnar(jvm_flags_string)
+    assert len(table) == 3
+    assert table.names == ["NewSize", "NumberOfLoopInstrToAlign", "OptimizeFill"]
+    assert table.origins == ["non-default", "management", "command line, ergonomic"]
+    assert table.kinds == [["product"], ["C2", "product"], ["C2", "product"]]
+    assert table.to_list_of_flag() == parse_jvm_flags(jvm_flags_string)
+
+
+def test_parse_jvm_flags_stops_at_closing_brace() -> None:
+    # The origin ends at its closing brace, anything in further braces is ignored.
+    jvm_flags_string = """
+     bool UseG1GC                                  = true                                   {product} {ergonomic} {extra}
+     bool UseSerialGC                              = false                                  {} {default}
+"""  # noqa: E501
+    assert parse_jvm_flags(jvm_flags_string) == [
+        JvmFlag(name="UseG1GC", type="bool", value="true", origin="ergonomic", kind=["product"])
+    ]
+
+
 @pytest.mark.xfail
 @pytest.mark.parametrize(
     "jvm_flags_string,expected_jvm_flags_list",
@@ -0,0 +1,174 @@
+import errno
+import os
+import socket
+import subprocess
+import sys
+from typing import Iterator, List, Tuple, Union
+
+import pytest
+
+from granulate_utils.linux.proc_events import _ProcEventsListener
+
+# linux/filter.h opcodes: BPF_LD|BPF_W|BPF_ABS, BPF_JMP|BPF_JEQ|BPF_K and BPF_RET|BPF_K
+BPF_LD_W_ABS = 0x20
+BPF_JMP_JEQ_K = 0x15
+BPF_RET_K = 0x06
+
+PROC_EVENT_FORK = 0x00000001
+
+
+def make_message(what: int, pid: int = 0, tgid: int = 0, exit_code: int = 0, nl_type: int = 0x3) -> bytes:
+    """A process connector message as the kernel sends it: nlmsghdr + cn_msg + proc_event"""
+    nlmsghdr = _ProcEventsListener._nlmsghdr
+    proc_event = _ProcEventsListener._proc_event_with_exit.pack(what, 0, 0, pid, tgid, exit_code, 0)
+    cn_msg = _ProcEventsListener._cn_msg.pack(0x1, 0x1, 0, 0, len(proc_event), 0) + proc_event
+    return nlmsghdr.pack(nlmsghdr.size + len(cn_msg), nl_type, 0, 0, 0) + cn_msg
+
+
+@pytest.fixture
+def listener() -> Iterator[_ProcEventsListener]:
+    # Not started, so nothing here needs privileges
+    listener = _ProcEventsListener()
+    yield listener
+    listener._close()
+
+
+@pytest.fixture
+def calls(listener: _ProcEventsListener) -> List[tuple]:
+    calls: List[tuple] = []
+    listener._exit_callbacks.append(lambda *args: calls.append(("exit",) + args))
+    listener._exec_callbacks.append(lambda *args: calls.append(("exec",) + args))
+    return calls
+
+
+def decode_socket_filter(program: bytes) -> List[Tuple[int, ...]]:
+    return list(_ProcEventsListener._sock_filter.iter_unpack(program))
+
+
+def run_socket_filter(program: bytes, packet: bytes) -> int:
+    """Interpret the few classic BPF instructions the filter uses, the way the kernel does"""
+    instructions = decode_socket_filter(program)
+    pc = 0
+    accumulator = 0
+    while True:
+        code, jt, jf, k = instructions[pc]
+        if code == BPF_LD_W_ABS:
+            # loads are in network byte order
+            accumulator = int.from_bytes(packet[k : k + 4], "big")
+            pc += 1
+        elif code == BPF_JMP_JEQ_K:
+            pc += 1 + (jt if accumulator == k else jf)
+        elif code == BPF_RET_K:
+            return k
+        else:
+            raise AssertionError(f"unexpected opcode {code:#x}")
+
+
+def as_loaded(value: int) -> int:
+    """A native __u32 as seen by a BPF word load"""
+    return int.from_bytes(value.to_bytes(4, sys.byteorder), "big")
+
+
+def test_socket_filter_program() -> None:
+    exit_, exec_ = _ProcEventsListener._PROC_EVENT_EXIT, _ProcEventsListener._PROC_EVENT_EXEC
+    assert decode_socket_filter(_ProcEventsListener._build_socket_filter()) == [
+        # proc_event.what is right after nlmsghdr (16 bytes) and cn_msg (20 bytes)
+        (BPF_LD_W_ABS, 0, 0, 36),
+        (BPF_JMP_JEQ_K, 1, 0, as_loaded(exit_)),
+        (BPF_JMP_JEQ_K, 0, 1, as_loaded(exec_)),
+        (BPF_RET_K, 0, 0, 0xFFFFFFFF),
+        (BPF_RET_K, 0, 0, 0),
+    ]
+
+
+@pytest.mark.parametrize(
+    "what,accepted",
+    [
+        (_ProcEventsListener._PROC_EVENT_EXIT, True),
+        (_ProcEventsListener._PROC_EVENT_EXEC, True),
+        (PROC_EVENT_FORK, False),
+        (0, False),
+    ],
+)
+def test_socket_filter_accepts(what: int, accepted: bool) -> None:
+    verdict = run_socket_filter(_ProcEventsListener._build_socket_filter(), make_message(what, pid=1234, tgid=1234))
+    assert verdict == (0xFFFFFFFF if accepted else 0)
+
+
+@pytest.mark.skipif(os.geteuid() != 0, reason="the process events connector requires root")
+def test_socket_filter_attached() -> None:
+    listener = _ProcEventsListener()
+    sock = listener._socket
+    try:
+        sock.bind((0, listener._CN_IDX_PROC))
+        listener._attach_socket_filter(sock)
+        listener._register_for_connector_events(sock)
+        sock.settimeout(0.5)
+
+        # each of these forks, execs and exits
+        for _ in range(3):
+            subprocess.run(["true"], check=True)
+
+        whats = []
+        try:
+            while True:
+                data = sock.recv(listener._RECV_BUFFER_SIZE)
+                whats.append(listener._proc_event_with_exit.unpack_from(data, 36)[0])
+        except socket.timeout:
+            pass
+    finally:
+        listener._close()
+
+    assert whats
+    assert set(whats) <= {listener._PROC_EVENT_EXIT, listener._PROC_EVENT_EXEC}
+
+
+@pytest.mark.parametrize(
+    "message,expected_calls",
+    [
+        (make_message(_ProcEventsListener._PROC_EVENT_EXIT, 100, 101, 9), [("exit", 100, 101, 9)]),
+        (make_message(_ProcEventsListener._PROC_EVENT_EXEC, 200, 201), [("exec", 200, 201)]),
+        # not an NLMSG_DONE message
+        (make_message(_ProcEventsListener._PROC_EVENT_EXIT, 100, 101, 9, nl_type=0x2), []),
+        # an event type without callbacks
+        (make_message(PROC_EVENT_FORK, 300, 301), []),
+    ],
+)
+def test_handle_message(
+    listener: _ProcEventsListener, calls: List[tuple], message: bytes, expected_calls: List[tuple]
+) -> None:
+    listener._handle_message(memoryview(message))
+    assert calls == expected_calls
+
+
+class FakeSocket:
+    """Plays back received messages (or errors) on recv_into()"""
+
+    def __init__(self, results: List[Union[bytes, Exception]]):
+        self._results = results
+
+    def recv_into(self, buffer: bytearray) -> int:
+        result = self._results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        buffer[: len(result)] = result
+        return len(result)
+
+    def close(self) -> None:
+        pass
+
+
+def test_drain_socket(listener: _ProcEventsListener, calls: List[tuple]) -> None:
+    results: List[Union[bytes, Exception]] = [
+        make_message(_ProcEventsListener._PROC_EVENT_EXEC, 1, 1),
+        OSError(errno.ENOBUFS, "No buffer space available"),
+        make_message(_ProcEventsListener._PROC_EVENT_EXIT, 1, 1, 0),
+        BlockingIOError(),
+    ]
+    listener._socket.close()
+    listener._socket = FakeSocket(results)  # type: ignore
+
+    listener._drain_socket()
+    assert calls == [("exec", 1, 1), ("exit", 1, 1, 0)]
+    # stopped reading once the socket was empty
+    assert results == []